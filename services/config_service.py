@@ -2,26 +2,49 @@
 
 import json
 import os
+from functools import lru_cache
+from pathlib import Path
 from typing import Dict, Any
 
+try:
+    import orjson  # parser JSON más rápido; opcional
+except ImportError:
+    orjson = None
+
 CONFIG_DIR = "config"
 CONFIG_PATH = os.path.join(CONFIG_DIR, "user_settings.json")
 
+# Pre-filtro de texto antes del OCR (ver extraction_service).
+# Se puede ajustar desde user_settings.json con la clave "text_min_laplacian_var".
+DEFAULT_TEXT_MIN_LAPLACIAN_VAR = 50.0
+
+
+@lru_cache(maxsize=1)
+def _read_settings(mtime_ns: int) -> Dict[str, Any]:
+    """
+    Lee y parsea CONFIG_PATH. Cacheado por la fecha de modificación del
+    fichero, así que sólo se vuelve a leer cuando cambia en disco.
+    """
+    raw = Path(CONFIG_PATH).read_bytes()
+    data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+    if isinstance(data, dict):
+        return data
+    return {}
+
 
 def load_user_settings() -> Dict[str, Any]:
     """
     Carga la configuración del usuario desde un JSON.
     Si no existe, devuelve un dict vacío.
     """
-    if not os.path.isfile(CONFIG_PATH):
+    try:
+        mtime_ns = os.stat(CONFIG_PATH).st_mtime_ns
+    except OSError:
         return {}
 
     try:
-        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        if isinstance(data, dict):
-            return data
-        return {}
+        # Copia: el dict cacheado no debe modificarse desde fuera
+        return dict(_read_settings(mtime_ns))
     except Exception as e:
         print(f"[WARN] No se pudo cargar la configuración: {e}")
         return {}
@@ -34,7 +57,22 @@ def save_user_settings(settings: Dict[str, Any]) -> None:
     """
     os.makedirs(CONFIG_DIR, exist_ok=True)
     try:
-        with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-            json.dump(settings, f, ensure_ascii=False, indent=2)
+        if orjson is not None:
+            raw = orjson.dumps(settings, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        else:
+            raw = json.dumps(settings, ensure_ascii=False, indent=2).encode("utf-8")
+        Path(CONFIG_PATH).write_bytes(raw)
     except Exception as e:
         print(f"[WARN] No se pudo guardar la configuración: {e}")
+
+
+def get_text_prefilter_threshold() -> float:
+    """
+    Devuelve la varianza mínima del Laplaciano por debajo de la cual se
+    considera que una imagen no tiene texto.
+    """
+    settings = load_user_settings()
+    try:
+        return float(settings.get("text_min_laplacian_var", DEFAULT_TEXT_MIN_LAPLACIAN_VAR))
+    except (TypeError, ValueError):
+        return DEFAULT_TEXT_MIN_LAPLACIAN_VAR
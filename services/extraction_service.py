@@ -1,20 +1,229 @@
 # services/extraction_service.py
 
-from typing import Dict
+import io
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 
-from services.ocr_service import run_ocr
+import cv2
+import numpy as np
+from PIL import Image
 
+from services.config_service import get_text_prefilter_threshold
+from services.ocr_cache import cache_key, lookup, store_many
+from services.ocr_service import (
+    HAS_TESSEROCR,
+    OCR_PIPELINE_FINGERPRINT,
+    TESS_POOL_SIZE,
+    run_ocr,
+    run_ocr_batch,
+)
 
-def extract_image_text(image_bytes: bytes, file_name: str) -> Dict[str, object]:
+OCR_LANG = "eng"  # o "spa", o "eng+spa"
+
+# Lado máximo (px) de la copia reducida usada por el pre-filtro de texto.
+# Con 500 px, draft() decodifica los JPEG grandes a 1/8 de escala.
+PREFILTER_MAX_SIDE = 500
+
+# La copia se divide en una rejilla de N x N bloques y se mira el bloque más
+# nítido: una cartela pequeña en una foto grande no se diluye en la media.
+PREFILTER_GRID = 4
+
+# Pool de hilos persistente, del mismo tamaño que el pool de PyTessBaseAPI
+# (ver ocr_service.get_tess_pool): cada hilo toma prestada una instancia.
+_OCR_EXECUTOR = ThreadPoolExecutor(max_workers=TESS_POOL_SIZE) if HAS_TESSEROCR else None
+
+
+def _looks_like_it_has_text(
+    image_bytes: bytes,
+    min_variance: float,
+    pil_image: Optional[Image.Image] = None,
+) -> bool:
     """
-    Ejecuta OCR sobre una imagen y devuelve un dict con:
-    - file_name: nombre del archivo
-    - ocr_text: texto extraído con Tesseract
-    - image_bytes: bytes originales de la imagen (para usar en el PDF)
+    Heurística barata para saltarse Tesseract en imágenes sin texto.
+
+    Trabaja sobre una copia reducida en escala de grises y sólo descarta la
+    imagen si ningún bloque de la rejilla (PREFILTER_GRID x PREFILTER_GRID)
+    alcanza `min_variance` de varianza del Laplaciano, es decir, si no hay
+    bordes nítidos en ninguna parte (imágenes lisas, degradados, fotos muy
+    desenfocadas). Ante la duda se hace OCR: ante cualquier error devuelve
+    True para no perder texto por culpa del filtro.
+
+    Si se pasa pil_image (ya decodificada), se reutiliza en lugar de volver a
+    abrir image_bytes; no se modifica.
     """
-    ocr_text = run_ocr(image_bytes, lang="eng")  # o "spa", o "eng+spa"
+    try:
+        if pil_image is not None:
+            image = pil_image
+        else:
+            image = Image.open(io.BytesIO(image_bytes))
+            image.draft("L", (PREFILTER_MAX_SIDE, PREFILTER_MAX_SIDE))
+
+        # Reducir antes de pasar a gris (BOX es el filtro más barato)
+        scale = PREFILTER_MAX_SIDE / max(image.size)
+        if scale < 1:
+            size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            image = image.resize(size, Image.BOX)
+        gray = np.asarray(image.convert("L"))
+
+        laplacian = cv2.Laplacian(gray, cv2.CV_64F)
+        return any(
+            block.var() >= min_variance
+            for row in np.array_split(laplacian, PREFILTER_GRID, axis=0)
+            for block in np.array_split(row, PREFILTER_GRID, axis=1)
+            if block.size
+        )
+    except Exception as e:
+        print(f"[WARN] Text pre-filter failed, running OCR anyway: {e}")
+        return True
+
+
+def _pipeline_fingerprint(min_variance: float) -> str:
+    """
+    Huella para el caché de OCR: la del pipeline de Tesseract más los
+    parámetros del pre-filtro, ya que su veredicto también se cachea.
+    """
+    return (
+        f"{OCR_PIPELINE_FINGERPRINT}"
+        f"|prefilter={min_variance}/{PREFILTER_MAX_SIDE}/{PREFILTER_GRID}"
+    )
+
+
+def _init_worker() -> None:
+    """Cada proceso del pool lanza un Tesseract mono-hilo."""
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _run_ocr_batch_parallel(image_paths: List[str]) -> List[str]:
+    """
+    Reparte las rutas en un bloque contiguo por núcleo y procesa cada bloque
+    con `run_ocr_batch` en un proceso distinto (una invocación de Tesseract
+    por proceso). Devuelve los textos en el mismo orden que `image_paths`.
+    """
+    n_workers = min(os.cpu_count() or 1, len(image_paths))
+    if n_workers <= 1:
+        return run_ocr_batch(image_paths, lang=OCR_LANG)
+
+    chunk_size = -(-len(image_paths) // n_workers)  # división hacia arriba
+    chunks = [
+        image_paths[i:i + chunk_size]
+        for i in range(0, len(image_paths), chunk_size)
+    ]
+
+    with multiprocessing.get_context("spawn").Pool(
+        len(chunks), initializer=_init_worker
+    ) as pool:
+        chunk_texts = pool.starmap(run_ocr_batch, [(chunk, OCR_LANG) for chunk in chunks])
+
+    return [text for texts in chunk_texts for text in texts]
+
+
+def _run_ocr_many(
+    images_bytes: List[bytes],
+    pil_images: List[Optional[Image.Image]],
+) -> List[str]:
+    """
+    Aplica OCR a varias imágenes con el backend disponible y devuelve los
+    textos en el mismo orden.
+
+    Con tesserocr, las imágenes se reparten entre los hilos del pool (la API C
+    libera el GIL, así que el OCR corre en paralelo) reutilizando las imágenes
+    PIL ya decodificadas. Sin tesserocr, una imagen sola va directamente a
+    `run_ocr`; varias se vuelcan a un directorio temporal y se procesan con
+    `run_ocr_batch` en un pool de procesos (una invocación de Tesseract por
+    núcleo).
+    """
+    if _OCR_EXECUTOR is not None:
+        return list(
+            _OCR_EXECUTOR.map(
+                lambda b, p: run_ocr(b, lang=OCR_LANG, pil_image=p),
+                images_bytes,
+                pil_images,
+            )
+        )
+
+    if len(images_bytes) == 1:
+        return [run_ocr(images_bytes[0], lang=OCR_LANG, pil_image=pil_images[0])]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        image_paths = []
+        for idx, image_bytes in enumerate(images_bytes):
+            path = os.path.join(tmp_dir, f"ocr_in_{idx}.png")
+            with open(path, "wb") as f:
+                f.write(image_bytes)
+            image_paths.append(path)
+
+        return _run_ocr_batch_parallel(image_paths)
+
+
+def _build_result(
+    file_name: str,
+    ocr_text: str,
+    image_bytes: bytes,
+    pil_image: Optional[Image.Image],
+) -> Dict[str, object]:
     return {
-        "file_name": file_name,
+        "file_name": str(file_name),  # build_ocr_pdf sorts on it
         "ocr_text": ocr_text,
         "image_bytes": image_bytes,
+        "pil_image": pil_image,
     }
+
+
+def extract_images_text(images_data: List[Dict[str, object]]) -> List[Dict[str, object]]:
+    """
+    Ejecuta OCR sobre un lote de imágenes.
+
+    Cada elemento de images_data debe contener:
+        {"name": "artwork_file.jpg", "bytes": original_image_bytes}
+    y opcionalmente "pil": la imagen PIL ya decodificada, que se reutiliza
+    en lugar de volver a abrir los bytes.
+
+    Las imágenes ya presentes en el caché de OCR (mismo contenido, idioma y
+    pipeline) no se vuelven a procesar, las repetidas dentro del lote se
+    procesan una sola vez y las que el pre-filtro considera sin texto se
+    devuelven vacías sin pasar por Tesseract (ese veredicto también se
+    cachea).
+
+    Devuelve, en el mismo orden de entrada, un dict por imagen con:
+    - file_name: nombre del archivo
+    - ocr_text: texto extraído con Tesseract (o del caché de OCR)
+    - image_bytes: bytes originales de la imagen (para usar en el PDF)
+    - pil_image: la imagen ya decodificada, si se pasó (la reutiliza el PDF)
+    """
+    if not images_data:
+        return []
+
+    min_variance = get_text_prefilter_threshold()
+    pipeline = _pipeline_fingerprint(min_variance)
+
+    keys = [cache_key(img_info["bytes"], OCR_LANG, pipeline) for img_info in images_data]
+    texts = {key: lookup(key) for key in keys}
+
+    # Resultados nuevos (OCR o veredicto "sin texto" del pre-filtro) a cachear
+    computed: Dict[str, str] = {}
+    pending: Dict[str, Dict[str, object]] = {}
+    for key, img_info in zip(keys, images_data):
+        if texts[key] is not None or key in pending or key in computed:
+            continue
+        if _looks_like_it_has_text(img_info["bytes"], min_variance, img_info.get("pil")):
+            pending[key] = img_info
+        else:
+            computed[key] = ""
+
+    if pending:
+        ocr_texts = _run_ocr_many(
+            [img_info["bytes"] for img_info in pending.values()],
+            [img_info.get("pil") for img_info in pending.values()],
+        )
+        computed.update(zip(pending, ocr_texts))
+
+    store_many(computed)
+    texts.update(computed)
+
+    return [
+        _build_result(img_info["name"], texts[key], img_info["bytes"], img_info.get("pil"))
+        for key, img_info in zip(keys, images_data)
+    ]
@@ -0,0 +1,84 @@
+# services/ocr_cache.py
+
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, Optional
+
+CACHE_DIR = "tmp_cache"
+CACHE_PATH = os.path.join(CACHE_DIR, "ocr.json")
+
+# Máximo de entradas guardadas; al superarlo se descartan las menos usadas
+MAX_CACHE_ENTRIES = 1000
+
+_cache_lock = threading.Lock()
+
+
+def cache_key(image_bytes: bytes, lang: Optional[str], pipeline: str = "") -> str:
+    """
+    Clave del caché: SHA-256 del contenido de la imagen + idioma de OCR +
+    huella del pipeline (preprocesado y parámetros de Tesseract). Dos subidas
+    del mismo fichero comparten clave aunque cambie el nombre; un cambio de
+    pipeline invalida las entradas antiguas.
+    """
+    pipeline_hash = hashlib.sha256(pipeline.encode("utf-8")).hexdigest()[:12]
+    return hashlib.sha256(image_bytes).hexdigest() + ":" + (lang or "") + ":" + pipeline_hash
+
+
+@lru_cache(maxsize=1)
+def _load_cache() -> Dict[str, str]:
+    """
+    Carga el caché de disco una sola vez por proceso. El dict devuelto es
+    también el caché en memoria: las escrituras lo actualizan en sitio.
+    """
+    if not os.path.isfile(CACHE_PATH):
+        return {}
+
+    try:
+        with open(CACHE_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return data
+        return {}
+    except Exception as e:
+        print(f"[WARN] No se pudo cargar el caché de OCR: {e}")
+        return {}
+
+
+def lookup(key: str) -> Optional[str]:
+    """Devuelve el texto cacheado para `key`, o None si no está."""
+    with _cache_lock:
+        cache = _load_cache()
+        text = cache.pop(key, None)
+        if text is not None:
+            cache[key] = text  # al final: usada más recientemente
+        return text
+
+
+def store_many(texts: Dict[str, str]) -> None:
+    """
+    Añade varias entradas {clave: texto} al caché y lo persiste en disco
+    con una sola escritura. Conserva como mucho MAX_CACHE_ENTRIES entradas,
+    descartando las usadas hace más tiempo.
+    """
+    if not texts:
+        return
+
+    with _cache_lock:
+        cache = _load_cache()
+        for key, text in texts.items():
+            cache.pop(key, None)
+            cache[key] = text
+        while len(cache) > MAX_CACHE_ENTRIES:
+            del cache[next(iter(cache))]
+
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = CACHE_PATH + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(cache, f, ensure_ascii=False)
+            os.replace(tmp_path, CACHE_PATH)
+        except Exception as e:
+            print(f"[WARN] No se pudo guardar el caché de OCR: {e}")
@@ -1,13 +1,227 @@
 # services/ocr_service.py
 
+import atexit
+import importlib.util
 import io
-from typing import Optional
+import os
+import queue
+import tempfile
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
 
-from PIL import Image
+from PIL import Image, ImageOps
 import pytesseract
 
+try:
+    # Dentro de la app, el pool de Tesseract sobrevive a los reruns de Streamlit
+    import streamlit as st
+    _cache_resource = st.cache_resource(show_spinner=False)
+except ImportError:
+    _cache_resource = lru_cache(maxsize=None)
 
-def run_ocr(image_bytes: bytes, lang: Optional[str] = "eng") -> str:
+# tesserocr usa la API C de Tesseract dentro del proceso (sin lanzar el binario
+# en cada imagen) y libera el GIL durante el reconocimiento. Si no está
+# instalado, se usa pytesseract.
+HAS_TESSEROCR = importlib.util.find_spec("tesserocr") is not None
+if HAS_TESSEROCR:
+    # Un Tesseract mono-hilo por worker: debe fijarse antes de cargar la librería
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    from tesserocr import PSM, PyTessBaseAPI
+
+
+# Tesseract separa las páginas de su salida de texto con un form-feed.
+PAGE_SEPARATOR = "\x0c"
+
+# Por encima de ~300 DPI Tesseract no gana precisión: las imágenes con un lado
+# mayor se reducen antes del OCR (el coste crece con el número de píxeles).
+MAX_OCR_SIDE = 2000
+
+# Heurística para imágenes de texto "digital" (capturas de PDFs, recibos...):
+# con pocos colores el texto es limpio y basta el modo rápido de Tesseract.
+DIGITAL_MAX_COLORS = 32   # por debajo: bloque único + sólo LSTM
+PURE_TEXT_MAX_COLORS = 8  # por debajo: además se binariza la imagen
+COLOR_SAMPLE_SIDE = 256   # lado de la muestra usada para contar colores
+COLOR_POSTERIZE_BITS = 3  # bits por canal al agrupar tonos casi iguales
+GRAY_POSTERIZE_BITS = 6   # lo mismo en imágenes de un solo canal (gris)
+COLOR_MIN_SHARE = 0.005   # fracción mínima de píxeles para contar un color
+DIGITAL_TESSERACT_CONFIG = "--psm 6 --oem 1"
+
+# Huella del pipeline de OCR: forma parte de la clave del caché de OCR, así que
+# el texto obtenido con otro preprocesado u otros parámetros no se reutiliza.
+# Sube OCR_PIPELINE_VERSION al cambiar el código del preprocesado.
+OCR_PIPELINE_VERSION = 4
+OCR_PIPELINE_FINGERPRINT = "|".join([
+    f"v{OCR_PIPELINE_VERSION}",
+    "tesserocr" if HAS_TESSEROCR else "pytesseract",
+    f"side={MAX_OCR_SIDE}",
+    f"colors={DIGITAL_MAX_COLORS}/{PURE_TEXT_MAX_COLORS}/{COLOR_SAMPLE_SIDE}"
+    f"/{COLOR_POSTERIZE_BITS}/{GRAY_POSTERIZE_BITS}/{COLOR_MIN_SHARE}",
+    DIGITAL_TESSERACT_CONFIG,
+])
+
+# Máximo de instancias de PyTessBaseAPI por idioma. Cada una carga su propio
+# modelo de idioma (decenas de MB), y en un contenedor os.cpu_count() devuelve
+# los núcleos del host, no la cuota: se limita a un pool pequeño.
+MAX_TESS_POOL_SIZE = 4
+try:
+    TESS_POOL_SIZE = min(MAX_TESS_POOL_SIZE, len(os.sched_getaffinity(0)))
+except AttributeError:  # sched_getaffinity sólo existe en Linux
+    TESS_POOL_SIZE = min(MAX_TESS_POOL_SIZE, os.cpu_count() or 1)
+
+_api_registry: List["PyTessBaseAPI"] = []
+_api_registry_lock = threading.Lock()
+
+
+class _TessPool:
+    """
+    Pool de PyTessBaseAPI de un idioma. Las instancias se crean bajo demanda
+    (como mucho `size`), así que sólo se cargan tantos modelos como hilos
+    hagan OCR a la vez.
+    """
+
+    def __init__(self, lang: str, size: int) -> None:
+        self.lang = lang
+        self.size = size
+        self.idle: "queue.Queue[PyTessBaseAPI]" = queue.Queue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def get(self) -> "PyTessBaseAPI":
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            create = self.created < self.size
+            if create:
+                self.created += 1
+        if not create:
+            return self.idle.get()  # todas prestadas: esperar a que vuelva una
+        try:
+            api = PyTessBaseAPI(lang=self.lang, psm=PSM.AUTO)
+        except Exception:
+            with self.lock:
+                self.created -= 1
+            raise
+        with _api_registry_lock:
+            _api_registry.append(api)
+        return api
+
+    def put(self, api: "PyTessBaseAPI") -> None:
+        self.idle.put(api)
+
+
+@_cache_resource
+def get_tess_pool(lang: str, n: int) -> _TessPool:
+    """
+    Devuelve el pool de hasta `n` instancias de PyTessBaseAPI para `lang`.
+    Cacheado como recurso de Streamlit, así que los modelos cargados
+    sobreviven entre generaciones de PDF y sólo se pagan una vez por proceso.
+    """
+    return _TessPool(lang, n)
+
+
+@contextmanager
+def _lease_api(lang: str) -> Iterator["PyTessBaseAPI"]:
+    """
+    Toma prestada una PyTessBaseAPI del pool de `lang` (creándola si hace
+    falta) y la devuelve al terminar. Una instancia no se comparte nunca
+    entre dos hilos a la vez.
+    """
+    pool = get_tess_pool(lang, TESS_POOL_SIZE)
+    api = pool.get()
+    try:
+        yield api
+    finally:
+        pool.put(api)
+
+
+@atexit.register
+def _end_apis() -> None:
+    """Libera todas las instancias de Tesseract al cerrar el proceso."""
+    with _api_registry_lock:
+        for api in _api_registry:
+            api.End()
+        _api_registry.clear()
+
+
+def preprocess_for_ocr(image: Image.Image) -> Image.Image:
+    """
+    Prepara una imagen para Tesseract: escala de grises, lado mayor limitado
+    a MAX_OCR_SIDE y contraste automático. Devuelve una imagen nueva; la
+    original (la que va al PDF) no se modifica.
+    """
+    image = image.convert("L")
+    if max(image.size) > MAX_OCR_SIDE:
+        image.thumbnail((MAX_OCR_SIDE, MAX_OCR_SIDE), Image.LANCZOS)
+    return ImageOps.autocontrast(image)
+
+
+def _count_colors(image: Image.Image) -> int:
+    """
+    Cuenta los colores dominantes de una muestra reducida de la imagen.
+
+    La muestra se estira con autocontraste y se posteriza, de modo que los
+    grises del antialiasing y el ruido de JPEG caen en el mismo tono que el
+    texto o el fondo, y sólo cuentan los colores que ocupan al menos
+    COLOR_MIN_SHARE de los píxeles. Una imagen en color se posteriza a
+    COLOR_POSTERIZE_BITS bits por canal; una en gris, que con tan pocos bits
+    nunca pasaría de 8 tonos, a GRAY_POSTERIZE_BITS. Una foto da decenas de
+    colores; una captura de texto digital, muy pocos.
+    """
+    scale = COLOR_SAMPLE_SIDE / max(image.size)
+    if scale < 1:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.NEAREST)  # NEAREST no inventa colores
+    if image.mode in ("1", "L", "LA", "I", "I;16", "F"):
+        sample, bits = image.convert("L"), GRAY_POSTERIZE_BITS
+    else:
+        sample, bits = image.convert("RGB"), COLOR_POSTERIZE_BITS
+    sample = ImageOps.posterize(ImageOps.autocontrast(sample), bits)
+    min_count = sample.width * sample.height * COLOR_MIN_SHARE
+    colors = sample.getcolors(2 ** (len(sample.getbands()) * bits)) or []
+    return sum(1 for count, _ in colors if count >= min_count)
+
+
+def _prepare_for_ocr(image: Image.Image) -> Tuple[Image.Image, int]:
+    """
+    Aplica `preprocess_for_ocr` y, si la imagen es texto casi puro (muy
+    pocos colores), la binariza. Devuelve (imagen para Tesseract, nº de
+    colores de la original).
+    """
+    n_colors = _count_colors(image)
+    prepared = preprocess_for_ocr(image)
+    if n_colors < PURE_TEXT_MAX_COLORS:
+        prepared = prepared.point(lambda p: 255 if p > 127 else 0)
+    return prepared, n_colors
+
+
+def _tesseract_config(n_colors: int) -> str:
+    """Parámetros de pytesseract para una imagen con `n_colors` colores."""
+    return DIGITAL_TESSERACT_CONFIG if n_colors < DIGITAL_MAX_COLORS else ""
+
+
+def _open_for_ocr(fp) -> Image.Image:
+    """
+    Abre una imagen para OCR. En JPEG, draft() hace que libjpeg decodifique
+    directamente a escala reducida (1/2, 1/4, 1/8) sin bajar de MAX_OCR_SIDE,
+    en lugar de decodificar la imagen completa para reducirla después. Se
+    decodifica en color (no en gris) para que `_count_colors` vea los colores
+    reales; el paso a gris lo hace `preprocess_for_ocr`. En otros formatos no
+    tiene efecto.
+    """
+    image = Image.open(fp)
+    image.draft("RGB", (MAX_OCR_SIDE, MAX_OCR_SIDE))
+    return image
+
+
+def run_ocr(
+    image_bytes: bytes,
+    lang: Optional[str] = "eng",
+    pil_image: Optional[Image.Image] = None,
+) -> str:
     """
     Aplica OCR con Tesseract a una imagen en bytes y devuelve el texto detectado.
 
@@ -20,12 +234,131 @@ def run_ocr(image_bytes: bytes, lang: Optional[str] = "eng") -> str:
         - "eng"      -> inglés
         - "spa"      -> español
         - "eng+spa"  -> inglés + español
+    pil_image : PIL.Image.Image, opcional
+        La misma imagen ya decodificada. Si se pasa, se usa en lugar de volver
+        a abrir image_bytes (no se modifica).
 
     Returns
     -------
     str
         Texto extraído de la imagen.
     """
-    image = Image.open(io.BytesIO(image_bytes))
-    text = pytesseract.image_to_string(image, lang=lang)
+    if pil_image is None:
+        pil_image = _open_for_ocr(io.BytesIO(image_bytes))
+    image, n_colors = _prepare_for_ocr(pil_image)
+    is_digital = n_colors < DIGITAL_MAX_COLORS
+
+    if HAS_TESSEROCR:
+        with _lease_api(lang or "eng") as api:
+            # El motor (OEM) se fija al crear la API; aquí sólo cambia el PSM
+            api.SetPageSegMode(PSM.SINGLE_BLOCK if is_digital else PSM.AUTO)
+            api.SetImage(image)
+            text = api.GetUTF8Text()
+    else:
+        text = pytesseract.image_to_string(image, lang=lang, config=_tesseract_config(n_colors))
     return text.strip()
+
+
+def _run_tesseract_list(
+    paths: List[str],
+    lang: Optional[str],
+    config: str,
+    list_path: str,
+) -> List[str]:
+    """
+    Aplica OCR a `paths` con una única invocación de Tesseract (vía un
+    fichero de lista en `list_path`) y devuelve un texto por ruta.
+    """
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(paths))
+        f.write("\n")
+
+    output = pytesseract.image_to_string(list_path, lang=lang, config=config)
+
+    # Tesseract termina cada página con un form-feed. Si el número no
+    # cuadra (una imagen ilegible, un TIFF multipágina...) no hay forma
+    # fiable de saber qué texto va con qué imagen: se repite imagen a imagen.
+    if output.count(PAGE_SEPARATOR) != len(paths):
+        print(
+            f"[WARN] Tesseract returned {output.count(PAGE_SEPARATOR)} pages "
+            f"for {len(paths)} images; running OCR per image"
+        )
+        return [
+            pytesseract.image_to_string(path, lang=lang, config=config).strip()
+            for path in paths
+        ]
+
+    pages = output.split(PAGE_SEPARATOR)
+    return [page.strip() for page in pages[: len(paths)]]
+
+
+def run_ocr_batch(image_paths: List[str], lang: Optional[str] = "eng") -> List[str]:
+    """
+    Aplica OCR a varias imágenes con una invocación de Tesseract por modo.
+
+    Tesseract acepta un fichero de texto con una ruta de imagen por línea y
+    procesa todas en el mismo proceso, así que el arranque y la carga del
+    modelo de idioma se pagan una sola vez por lista en lugar de una vez por
+    imagen. Cada imagen pasa antes por el mismo preprocesado que en `run_ocr`
+    y las imágenes se agrupan según los parámetros que `run_ocr` usaría con
+    ellas (DIGITAL_TESSERACT_CONFIG o los de por defecto), con una lista por
+    grupo: el texto no depende de si la imagen se procesó sola o en lote.
+
+    Parameters
+    ----------
+    image_paths : list[str]
+        Rutas de las imágenes en disco, en el orden deseado.
+    lang : str, opcional
+        Idioma(s) para Tesseract (ver `run_ocr`).
+
+    Returns
+    -------
+    list[str]
+        Texto extraído de cada imagen, en el mismo orden que `image_paths`.
+    """
+    if not image_paths:
+        return []
+
+    texts: List[str] = [""] * len(image_paths)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # {config de Tesseract: [(índice, ruta preprocesada)]}
+        groups: Dict[str, List[Tuple[int, str]]] = {}
+        for idx, path in enumerate(image_paths):
+            config = ""
+            try:
+                with _open_for_ocr(path) as image:
+                    ocr_path = os.path.join(tmp_dir, f"ocr_{idx}.png")
+                    prepared, n_colors = _prepare_for_ocr(image)
+                    prepared.save(ocr_path, format="PNG")
+                config = _tesseract_config(n_colors)
+            except Exception as e:
+                print(f"[WARN] Could not preprocess {path} for OCR: {e}")
+                ocr_path = path
+            groups.setdefault(config, []).append((idx, os.path.abspath(ocr_path)))
+
+        for group_idx, (config, items) in enumerate(groups.items()):
+            list_path = os.path.join(tmp_dir, f"list_{group_idx}.txt")
+            group_texts = _run_tesseract_list(
+                [ocr_path for _, ocr_path in items], lang, config, list_path
+            )
+            for (idx, _), text in zip(items, group_texts):
+                texts[idx] = text
+
+    return texts
+
+
+def warm_up(lang: Optional[str] = "eng") -> None:
+    """
+    Ejecuta un OCR sobre una imagen blanca de 32x32 para que la primera
+    imagen real no pague la carga de los datos de idioma: con tesserocr crea
+    la primera PyTessBaseAPI del pool (el resto se crea al necesitarse); con
+    pytesseract deja los ficheros de tessdata en la caché de páginas del
+    sistema.
+    """
+    image = Image.new("L", (32, 32), 255)
+    if HAS_TESSEROCR:
+        with _lease_api(lang or "eng") as api:
+            api.SetImage(image)
+            api.GetUTF8Text()
+    else:
+        pytesseract.image_to_string(image, lang=lang)
@@ -1,13 +1,33 @@
 # services/pdf_service.py
 
-from typing import List, Dict, Optional, Tuple
+from typing import BinaryIO, List, Dict, Optional, Tuple
 
 import os
 import io
+import operator
 from fpdf import FPDF
+from fpdf.image_parsing import preload_image
 from PIL import Image
 
 
+# Notice printed in red at the top of every page
+DEMO_NOTICE = "This is a demo. Please contact the developer for full access."
+
+# Typographic characters Tesseract often emits that have a plain ASCII
+# equivalent; mapping them keeps most OCR text on the ASCII fast path.
+_ASCII_SUBSTITUTIONS = str.maketrans({
+    "\u2018": "'",    # left single quote
+    "\u2019": "'",    # right single quote
+    "\u201c": '"',    # left double quote
+    "\u201d": '"',    # right double quote
+    "\u2013": "-",    # en dash
+    "\u2014": "-",    # em dash
+    "\u2026": "...",  # ellipsis
+    "\ufb01": "fi",   # fi ligature
+    "\ufb02": "fl",   # fl ligature
+})
+
+
 def _to_latin1(text) -> str:
     """
     FPDF uses latin-1 internally, so we convert text to avoid encoding errors.
@@ -17,23 +37,80 @@ def _to_latin1(text) -> str:
         return ""
     if not isinstance(text, str):
         text = str(text)
+    if text.isascii():
+        return text
+    text = text.translate(_ASCII_SUBSTITUTIONS)
+    if text.isascii():
+        return text
     return text.encode("latin-1", "replace").decode("latin-1")
 
 
+def _is_jpeg(image_bytes: bytes) -> bool:
+    """
+    True if the bytes start with the JPEG magic number (SOI marker).
+    """
+    return image_bytes[:3] == b"\xff\xd8\xff"
+
+
 def _normalize_color(color: Tuple[int, int, int]) -> Tuple[int, int, int]:
     """
     Normalizes a color tuple (r, g, b) into integers in range 0–255.
     """
     if not isinstance(color, (tuple, list)) or len(color) != 3:
         return (0, 0, 0)
+    if isinstance(color, tuple) and all(isinstance(c, int) for c in color):
+        return color  # already normalized (e.g. from hex_to_rgb)
     r, g, b = color
     return int(r), int(g), int(b)
 
 
+def _preprocess_item(item: Dict[str, object], artwork_w_mm: float) -> Dict[str, object]:
+    """
+    Prepares everything a page needs that does not touch the FPDF object:
+    the image source to embed, its height in mm and the latin-1 OCR text.
+    Only the image header is read here; fpdf2 decodes non-JPEG images when
+    they are embedded.
+    """
+    file_name = item["file_name"]
+    ocr_text = str(item.get("ocr_text", ""))
+    image_bytes = item.get("image_bytes", None)
+    pil_image = item.get("pil_image", None)
+
+    prepped = {
+        "file_name": file_name,
+        "art_source": None,
+        "h_mm": 0.0,
+        "text_latin1": _to_latin1(ocr_text if ocr_text else "[No text detected]"),
+    }
+
+    if image_bytes:
+        try:
+            # Reuse the decoded image if we got one; otherwise Image.open
+            # only parses the header here
+            img = pil_image if pil_image is not None else Image.open(io.BytesIO(image_bytes))
+            img_w_px, img_h_px = img.size if img.size != (0, 0) else (1, 1)
+
+            if _is_jpeg(image_bytes):
+                # JPEG bytes are embedded as-is (DCT stream, no decode/re-encode)
+                prepped["art_source"] = io.BytesIO(image_bytes)
+            else:
+                # Other formats go through the PIL image
+                prepped["art_source"] = img
+
+            # Proportional height (mm)
+            prepped["h_mm"] = artwork_w_mm * img_h_px / img_w_px
+        except Exception as e:
+            print(f"[WARN] Could not prepare artwork image {file_name}: {e}")
+            prepped["art_source"] = None
+
+    return prepped
+
+
 def build_ocr_pdf(
     ocr_items: List[Dict[str, object]],
     # Logo
     logo_path: Optional[str] = None,
+    logo_image: Optional[Image.Image] = None,
     logo_x: float = 10,
     logo_y: float = 8,
     logo_width: float = 25,
@@ -47,7 +124,10 @@ def build_ocr_pdf(
     body_font_size: float = 11,
     title_color: Tuple[int, int, int] = (15, 23, 42),
     body_color: Tuple[int, int, int] = (15, 23, 42),
-) -> bytes:
+    # Order & output
+    already_sorted: bool = False,
+    output_stream: Optional[BinaryIO] = None,
+) -> Optional[bytes]:
     """
     Builds a PDF from a list of OCR results, placing logo, centered artwork image and centered text.
 
@@ -58,6 +138,20 @@ def build_ocr_pdf(
             "image_bytes": original_image_bytes
         }
 
+    and may also carry "pil_image": the already decoded PIL image, which is
+    reused for the size and for non-JPEG embedding instead of re-opening bytes.
+
+    "file_name" is required and must be a str: pages follow file_name order
+    (a missing key raises KeyError). Pass already_sorted=True when ocr_items
+    already come sorted that way to skip the sort.
+
+    The logo can be given as an in-memory PIL image (logo_image) or as a
+    file path (logo_path); logo_image takes precedence.
+
+    If output_stream (a binary file-like object) is given, the PDF is written
+    to it and None is returned, so the caller does not hold an extra copy of
+    the document in memory. Otherwise the PDF is returned as bytes.
+
     NOTE: The file name is NOT printed anymore; only the demo notice,
     the artwork image and the OCR text are included.
     """
@@ -68,45 +162,63 @@ def build_ocr_pdf(
     pdf = FPDF(orientation=orientation, unit="mm", format=page_format)
     pdf.set_auto_page_break(auto=True, margin=15)
 
-    # Is logo available?
-    use_logo = logo_path is not None and os.path.isfile(logo_path)
+    # Is logo available? (FPDF accepts both PIL images and paths)
+    logo_source = None
+    if logo_image is not None:
+        # FPDF keys its image cache by an md5 of the decoded pixels when given
+        # a PIL image, i.e. a full tobytes() + hash on every page. Register the
+        # logo once and pass its cache key on each page (a plain cache hit).
+        try:
+            logo_source, _, _ = preload_image(pdf.image_cache, logo_image)
+        except Exception as e:
+            print(f"[WARN] Could not load logo image: {e}")
+    elif logo_path is not None and os.path.isfile(logo_path):
+        logo_source = logo_path
+    use_logo = logo_source is not None
 
     # Sort by file name for consistency (even if we do not print it)
-    ocr_items_sorted = sorted(ocr_items, key=lambda x: str(x.get("file_name", "")))
+    if already_sorted:
+        ocr_items_sorted = ocr_items
+    else:
+        ocr_items_sorted = sorted(ocr_items, key=operator.itemgetter("file_name"))
+
+    # ---- Per-page invariants, computed once ----
+    # Small top margin below the logo
+    if use_logo:
+        top_margin = logo_y + logo_width + 2  # tighter spacing
+    else:
+        top_margin = 20
+
+    # Width inside margins
+    text_width = pdf.w - pdf.l_margin - pdf.r_margin
 
-    # Temp directory for artwork images
-    os.makedirs("tmp_images", exist_ok=True)
+    demo_text_l1 = _to_latin1(DEMO_NOTICE)
 
-    for idx, item in enumerate(ocr_items_sorted):
-        file_name = str(item.get("file_name", "unknown"))
-        ocr_text = str(item.get("ocr_text", ""))
-        image_bytes = item.get("image_bytes", None)
+    # Desired image width: use up to 80% of available width, capped
+    artwork_w_mm = min(120.0, text_width * 0.8)
 
+    prepped_items = [_preprocess_item(item, artwork_w_mm) for item in ocr_items_sorted]
+
+    # Font never changes between pages (FPDF re-applies it on add_page),
+    # so only the text color is switched inside the loop
+    pdf.set_font(body_font_family, "", body_font_size)
+
+    for prepped in prepped_items:
         pdf.add_page()
 
         # ---- LOGO (if any) ----
         if use_logo:
             try:
-                pdf.image(logo_path, x=logo_x, y=logo_y, w=logo_width)
+                pdf.image(logo_source, x=logo_x, y=logo_y, w=logo_width)
             except Exception as e:
                 print(f"[WARN] Could not draw logo: {e}")
 
-        # Small top margin below the logo
-        if use_logo:
-            top_margin = logo_y + logo_width + 2  # tighter spacing
-        else:
-            top_margin = 20
-
-        # Width inside margins
-        text_width = pdf.w - pdf.l_margin - pdf.r_margin
-
         # ==== DEMO NOTICE (centered, no big gap) ====
         pdf.set_xy(pdf.l_margin, top_margin)
-        pdf.set_font(body_font_family, "", body_font_size)
-        pdf.set_text_color(200, 0, 0)  # red
-        demo_text = "This is a demo. Please contact the developer for full access."
-        pdf.multi_cell(text_width, 6, _to_latin1(demo_text), align="C")
-        pdf.ln(2)  # small gap
+        if demo_text_l1:
+            pdf.set_text_color(200, 0, 0)  # red
+            pdf.multi_cell(text_width, 6, demo_text_l1, align="C")
+            pdf.ln(2)  # small gap
 
         # Current Y after the demo line
         current_y = pdf.get_y()
@@ -114,45 +226,33 @@ def build_ocr_pdf(
         # ---- ARTWORK IMAGE (centered horizontally) ----
         text_start_y = current_y  # default if no image
 
-        if image_bytes:
+        if prepped["art_source"] is not None:
             try:
-                img = Image.open(io.BytesIO(image_bytes))
-                img_w_px, img_h_px = img.size if img.size != (0, 0) else (1, 1)
-
-                # Available page width (mm) inside margins
-                page_width_mm = text_width
-
-                # Desired image width: use up to 80% of available width, capped
-                artwork_w_mm = min(120.0, page_width_mm * 0.8)
-                # Proportional height (mm)
-                artwork_h_mm = artwork_w_mm * img_h_px / img_w_px
-
-                # Save temp PNG so FPDF can read it
-                art_path = os.path.join("tmp_images", f"art_{idx}.png")
-                img.save(art_path, format="PNG")
-
                 # Center horizontally
                 image_x = (pdf.w - artwork_w_mm) / 2.0
                 image_y = current_y
-                pdf.image(art_path, x=image_x, y=image_y, w=artwork_w_mm)
+                pdf.image(prepped["art_source"], x=image_x, y=image_y, w=artwork_w_mm)
 
-                text_start_y = image_y + artwork_h_mm + 4
+                text_start_y = image_y + prepped["h_mm"] + 4
 
             except Exception as e:
-                print(f"[WARN] Could not draw artwork image {file_name}: {e}")
+                print(f"[WARN] Could not draw artwork image {prepped['file_name']}: {e}")
                 text_start_y = current_y
 
         # ---- OCR TEXT (centered, below image or demo notice) ----
         pdf.set_xy(pdf.l_margin, text_start_y)
-        pdf.set_font(body_font_family, "", body_font_size)
         pdf.set_text_color(body_r, body_g, body_b)
         pdf.multi_cell(
             text_width,
             6,
-            _to_latin1(ocr_text if ocr_text else "[No text detected]"),
+            prepped["text_latin1"],
             align="C",  # center each line
         )
 
+    if output_stream is not None:
+        pdf.output(output_stream)
+        return None
+
     # Return PDF as bytes (handles different fpdf2 versions)
     raw = pdf.output(dest="S")
     if isinstance(raw, (bytes, bytearray)):
@@ -1,13 +1,15 @@
 # app.py
 
-import concurrent.futures
+import io
 import os
+from functools import lru_cache
 
 import streamlit as st
 from PIL import Image
 
-from utils.image_utils import read_uploaded_file, bytes_to_pil_image
-from services.extraction_service import extract_image_text
+from utils.image_utils import read_uploaded_file, uploaded_file_to_pil_image
+from services.extraction_service import OCR_LANG, extract_images_text
+from services.ocr_service import warm_up
 from services.pdf_service import build_ocr_pdf
 from services.config_service import load_user_settings, save_user_settings
 from ui_styles import MAIN_CSS
@@ -19,12 +21,13 @@ DEFAULT_LOGO_PATH = "assets/knb+art+advisory-3.webp"
 
 # ==== HELPERS ====
 
+@lru_cache(maxsize=64)
 def hex_to_rgb(hex_color: str):
     """Convert '#RRGGBB' to (r, g, b)."""
-    hex_color = hex_color.lstrip("#")
-    return tuple(int(hex_color[i:i + 2], 16) for i in (0, 2, 4))
+    return tuple(bytes.fromhex(hex_color.lstrip("#")))
 
 
+@lru_cache(maxsize=64)
 def get_page_size_mm(page_format: str):
     """
     Returns (width_mm, height_mm) for A4 or Letter in portrait.
@@ -38,6 +41,7 @@ def get_page_size_mm(page_format: str):
     return 210, 297
 
 
+@lru_cache(maxsize=64)
 def compute_logo_position(position_key: str, page_format: str, orientation: str, logo_width_mm: float):
     """
     Computes (x, y) for logo based on:
@@ -129,17 +133,29 @@ def save_logo_persistent(logo_pil_image: Image.Image) -> str:
     return path
 
 
-def save_logo_temp(logo_pil_image: Image.Image) -> str:
+@st.cache_resource(show_spinner=False)
+def warm_up_ocr() -> bool:
     """
-    Saves the logo as a temporary PNG (for FPDF) and returns the path.
+    Loads the Tesseract language data once per server process, so the
+    first PDF generation does not pay for it.
     """
-    temp_path = "temp_logo_runtime.png"
-    logo_pil_image.save(temp_path, format="PNG")
-    return temp_path
+    try:
+        warm_up(OCR_LANG)
+    except Exception as e:
+        print(f"[WARN] Could not warm up OCR: {e}")
+    return True
+
+
+@st.cache_data(show_spinner=False)
+def load_user_settings_cached() -> dict:
+    """
+    load_user_settings() memoized across reruns; cleared when settings are saved.
+    """
+    return load_user_settings()
 
 
 # ==== LOAD PERSISTENT SETTINGS ====
-stored_settings = load_user_settings()
+stored_settings = load_user_settings_cached()
 
 stored_logo_mode = stored_settings.get("logo_mode", "default")  # "default" or "custom"
 stored_logo_path = stored_settings.get("logo_path", DEFAULT_LOGO_PATH)
@@ -358,7 +374,9 @@ with st.sidebar:
             "body_color_hex": body_color_hex,
         }
 
-        save_user_settings(new_settings)
+        # Merge so keys not exposed in the UI (e.g. OCR pre-filter thresholds) survive
+        save_user_settings({**stored_settings, **new_settings})
+        load_user_settings_cached.clear()
         st.success("Settings saved. They will be used automatically next time you open the app.")
 
 # =========================
@@ -379,13 +397,19 @@ with col_center:
 images_data = []
 
 if uploaded_files:
-    # Convert UploadedFile to bytes + name
+    # Convert UploadedFile to bytes + name, and open it once with PIL:
+    # the same image is reused by the preview, the OCR and the PDF.
     for uploaded in uploaded_files:
         file_bytes = read_uploaded_file(uploaded)
+        try:
+            pil_img = uploaded_file_to_pil_image(uploaded)
+        except Exception:
+            pil_img = None
         images_data.append(
             {
                 "name": uploaded.name,
                 "bytes": file_bytes,
+                "pil": pil_img,
             }
         )
 
@@ -397,9 +421,10 @@ if uploaded_files:
         col = cols[idx % 3]
         with col:
             try:
-                pil_img = bytes_to_pil_image(img_info["bytes"])
+                if img_info["pil"] is None:
+                    raise ValueError("image could not be opened")
                 col.image(
-                    pil_img,
+                    img_info["pil"],
                     caption=img_info["name"],
                     use_container_width=True,
                 )
@@ -418,63 +443,52 @@ if uploaded_files:
     )
 
     if process_button:
-        st.info("Running OCR on all images in parallel...")
-
-        with st.spinner("Extracting text and building the PDF..."):
-            # 1) OCR in parallel
-            with concurrent.futures.ThreadPoolExecutor(
-                max_workers=min(8, len(images_data))
-            ) as executor:
-                futures = [
-                    executor.submit(
-                        extract_image_text,
-                        img_info["bytes"],
-                        img_info["name"],
-                    )
-                    for img_info in images_data
-                ]
-
-                ocr_results = []
-                for future in concurrent.futures.as_completed(futures):
-                    ocr_results.append(future.result())
-
-            # 2) Prepare logo for PDF, if any
-            logo_for_pdf_path = None
-            if logo_pil_image is not None:
-                logo_for_pdf_path = save_logo_temp(logo_pil_image)
-
-            # 3) Compute logo position (x, y)
-            logo_x, logo_y = compute_logo_position(
-                position_key=logo_position_key,
-                page_format=pdf_page_format,
-                orientation=pdf_orientation,
-                logo_width_mm=logo_width_mm,
-            )
+        st.info("Running OCR on all images...")
+
+        # build_ocr_pdf writes straight into this buffer, which st.download_button
+        # accepts as-is (no extra bytes copy returned from the builder)
+        with io.BytesIO() as pdf_file:
+            with st.spinner("Extracting text and building the PDF..."):
+                # 1) OCR of the whole batch (results keep the input order)
+                ocr_results = extract_images_text(images_data)
+
+                # 2) Compute logo position (x, y)
+                logo_x, logo_y = compute_logo_position(
+                    position_key=logo_position_key,
+                    page_format=pdf_page_format,
+                    orientation=pdf_orientation,
+                    logo_width_mm=logo_width_mm,
+                )
 
-            # 4) Build PDF
-            pdf_bytes = build_ocr_pdf(
-                ocr_items=ocr_results,
-                logo_path=logo_for_pdf_path,
-                logo_x=logo_x,
-                logo_y=logo_y,
-                logo_width=logo_width_mm,
-                page_format=pdf_page_format,
-                orientation=pdf_orientation,
-                title_font_family=title_font_family,
-                title_font_size=title_font_size,
-                body_font_family=body_font_family,
-                body_font_size=body_font_size,
-                title_color=title_color_rgb,
-                body_color=body_color_rgb,
-            )
+                # 3) Build PDF (logo goes in as the in-memory PIL image)
+                build_ocr_pdf(
+                    ocr_items=ocr_results,
+                    logo_image=logo_pil_image,
+                    logo_x=logo_x,
+                    logo_y=logo_y,
+                    logo_width=logo_width_mm,
+                    page_format=pdf_page_format,
+                    orientation=pdf_orientation,
+                    title_font_family=title_font_family,
+                    title_font_size=title_font_size,
+                    body_font_family=body_font_family,
+                    body_font_size=body_font_size,
+                    title_color=title_color_rgb,
+                    body_color=body_color_rgb,
+                    output_stream=pdf_file,
+                )
 
-        st.success("PDF generated successfully!")
+            st.success("PDF generated successfully!")
 
-        st.download_button(
-            label="⬇️ Download PDF",
-            data=pdf_bytes,
-            file_name="artwork_catalog_demo.pdf",
-            mime="application/pdf",
-        )
+            pdf_file.seek(0)
+            st.download_button(
+                label="⬇️ Download PDF",
+                data=pdf_file,
+                file_name="artwork_catalog_demo.pdf",
+                mime="application/pdf",
+            )
 else:
     st.info("Upload at least one artwork image to get started.")
+
+# Warm up OCR after the page has been rendered (no-op after the first run)
+warm_up_ocr()
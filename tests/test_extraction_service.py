@@ -0,0 +1,73 @@
+import io
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from services.config_service import DEFAULT_TEXT_MIN_LAPLACIAN_VAR
+from services.extraction_service import _looks_like_it_has_text
+
+
+def _to_bytes(image: Image.Image, fmt: str = "PNG") -> bytes:
+    buf = io.BytesIO()
+    image.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def _has_text(image: Image.Image, fmt: str = "PNG") -> bool:
+    return _looks_like_it_has_text(_to_bytes(image, fmt), DEFAULT_TEXT_MIN_LAPLACIAN_VAR)
+
+
+def _text_image(n_lines: int) -> Image.Image:
+    image = Image.new("RGB", (1200, 800), "white")
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=28)
+    for line in range(n_lines):
+        draw.text((20, 20 + line * 38), "The quick brown fox jumps over", fill="black", font=font)
+    return image
+
+
+def _painting() -> Image.Image:
+    """Foto de un cuadro: manchas de color suaves, sin bordes nítidos."""
+    rng = np.random.default_rng(0)
+    blobs = Image.fromarray((rng.random((30, 40, 3)) * 255).astype("uint8"))
+    return blobs.resize((4000, 3000), Image.BICUBIC).filter(ImageFilter.GaussianBlur(20))
+
+
+def _painting_with_caption(font_size: int) -> Image.Image:
+    image = _painting()
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((3300, 2700, 3900, 2900), fill="white")
+    font = ImageFont.load_default(size=font_size)
+    draw.text((3320, 2720), "Oil on canvas, 1962", fill="black", font=font)
+    return image
+
+
+def test_single_line_of_text_passes():
+    assert _has_text(_text_image(1))
+
+
+def test_few_lines_of_text_pass():
+    assert _has_text(_text_image(4))
+    assert _has_text(_text_image(10))
+
+
+def test_painting_with_small_caption_passes():
+    assert _has_text(_painting_with_caption(40), fmt="JPEG")
+    assert _has_text(_painting_with_caption(25), fmt="JPEG")
+
+
+def test_flat_image_is_skipped():
+    assert not _has_text(Image.new("RGB", (1200, 800), "white"))
+    assert not _has_text(Image.new("RGB", (1200, 800), (120, 90, 60)), fmt="JPEG")
+
+
+def test_gradient_is_skipped():
+    gradient = np.tile(np.linspace(0, 255, 1200), (800, 1)).astype("uint8")
+    assert not _has_text(Image.fromarray(gradient))
+
+
+def test_decoded_image_is_reused_and_not_modified():
+    image = _text_image(1)
+    before = image.tobytes()
+    assert _looks_like_it_has_text(b"", DEFAULT_TEXT_MIN_LAPLACIAN_VAR, image)
+    assert image.tobytes() == before
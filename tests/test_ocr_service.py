@@ -0,0 +1,190 @@
+import io
+import os
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from services import ocr_service
+from services.ocr_service import (
+    DIGITAL_MAX_COLORS,
+    DIGITAL_TESSERACT_CONFIG,
+    MAX_TESS_POOL_SIZE,
+    PURE_TEXT_MAX_COLORS,
+    TESS_POOL_SIZE,
+    _count_colors,
+    _open_for_ocr,
+    _prepare_for_ocr,
+    run_ocr_batch,
+)
+
+
+def _text_image(fill="black") -> Image.Image:
+    """Captura de texto con antialiasing (FreeType), negro sobre blanco."""
+    image = Image.new("RGB", (1200, 800), "white")
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=28)
+    for line in range(20):
+        draw.text(
+            (20, 20 + line * 38),
+            "The quick brown fox jumps over the lazy dog 0123456789",
+            fill=fill,
+            font=font,
+        )
+    return image
+
+
+def _jpeg_bytes(image: Image.Image) -> bytes:
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+
+def _as_jpeg(image: Image.Image) -> Image.Image:
+    return Image.open(io.BytesIO(_jpeg_bytes(image)))
+
+
+def _prepare_jpeg(image: Image.Image):
+    """Mismo camino que run_ocr_batch: JPEG -> _open_for_ocr -> _prepare_for_ocr."""
+    with _open_for_ocr(io.BytesIO(_jpeg_bytes(image))) as opened:
+        return _prepare_for_ocr(opened)
+
+
+def _photo_image() -> Image.Image:
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, 1200)
+    y = np.linspace(0, 255, 800)
+    channels = np.stack([
+        np.add.outer(y * 0.8, x / 3),
+        np.tile(x, (800, 1)),
+        np.add.outer(255 - y, 0 * x),
+    ], axis=-1)
+    noisy = channels + rng.normal(0, 20, channels.shape)
+    return Image.fromarray(np.clip(noisy, 0, 255).astype("uint8"))
+
+
+def test_antialiased_text_is_pure_text():
+    image = _text_image()
+    assert len(image.getcolors(1 << 16)) > 64  # el antialiasing añade grises
+    assert _count_colors(image) < PURE_TEXT_MAX_COLORS
+
+
+def test_antialiased_text_jpeg_is_pure_text():
+    assert _count_colors(_as_jpeg(_text_image())) < PURE_TEXT_MAX_COLORS
+
+
+def test_colored_text_jpeg_is_digital():
+    assert _count_colors(_as_jpeg(_text_image(fill=(200, 0, 0)))) < DIGITAL_MAX_COLORS
+
+
+def test_photo_is_not_digital():
+    assert _count_colors(_photo_image()) >= DIGITAL_MAX_COLORS
+    assert _count_colors(_as_jpeg(_photo_image())) >= DIGITAL_MAX_COLORS
+
+
+def test_pure_text_is_binarized():
+    prepared, _ = _prepare_for_ocr(_text_image())
+    assert prepared.mode == "L"
+    assert {value for _, value in prepared.getcolors()} <= {0, 255}
+
+
+def test_jpeg_photo_through_open_for_ocr_is_not_digital():
+    photo = _photo_image()
+    dark_photo = Image.fromarray((np.asarray(photo) * 0.35).astype("uint8"))
+    for image in (photo, dark_photo):
+        prepared, n_colors = _prepare_jpeg(image)
+        assert n_colors >= DIGITAL_MAX_COLORS
+        assert len(prepared.getcolors(256)) > 2  # no se binariza
+
+
+def test_grayscale_photo_is_not_digital():
+    gray_photo = _photo_image().convert("L")
+    assert _count_colors(gray_photo) >= DIGITAL_MAX_COLORS
+    _, n_colors = _prepare_jpeg(gray_photo)
+    assert n_colors >= DIGITAL_MAX_COLORS
+
+
+def test_jpeg_text_through_open_for_ocr_is_pure_text():
+    _, n_colors = _prepare_jpeg(_text_image())
+    assert n_colors < PURE_TEXT_MAX_COLORS
+    assert _count_colors(_text_image().convert("L")) < PURE_TEXT_MAX_COLORS
+
+
+def test_tess_pool_creates_instances_lazily_up_to_size(monkeypatch):
+    class FakeApi:
+        def __init__(self, lang, psm):
+            self.lang = lang
+
+        def End(self):
+            pass
+
+    class FakePSM:
+        AUTO = 3
+
+    monkeypatch.setattr(ocr_service, "PyTessBaseAPI", FakeApi, raising=False)
+    monkeypatch.setattr(ocr_service, "PSM", FakePSM, raising=False)
+    monkeypatch.setattr(ocr_service, "_api_registry", [])
+
+    pool = ocr_service._TessPool("eng", 2)
+    assert pool.created == 0
+
+    first = pool.get()
+    pool.put(first)
+    assert pool.get() is first  # reutiliza la libre en vez de crear otra
+    second = pool.get()
+    assert second is not first
+    assert pool.created == 2
+
+    pool.put(second)
+    assert pool.get() is second  # con el pool lleno no se crean más
+    assert pool.created == 2
+
+
+def test_tess_pool_size_is_capped():
+    assert 1 <= TESS_POOL_SIZE <= MAX_TESS_POOL_SIZE
+
+
+def _fake_image_to_string(calls, drop_pages=False):
+    """Sustituto de pytesseract.image_to_string: devuelve "<config>" por página."""
+
+    def image_to_string(image, lang=None, config=""):
+        calls.append((image, config))
+        if str(image).endswith(".txt"):
+            with open(image, encoding="utf-8") as f:
+                n_pages = len(f.read().split())
+            if drop_pages:
+                n_pages -= 1
+            return "".join(f"<{config}>\x0c" for _ in range(n_pages))
+        return f"<{config}>"
+
+    return image_to_string
+
+
+def _save_inputs(tmp_path):
+    paths = []
+    for name, image in [("photo", _photo_image()), ("text", _text_image()), ("photo2", _photo_image())]:
+        path = os.path.join(tmp_path, f"{name}.jpg")
+        image.save(path, format="JPEG", quality=85)
+        paths.append(path)
+    return paths
+
+
+def test_batch_uses_the_same_config_as_run_ocr(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(ocr_service.pytesseract, "image_to_string", _fake_image_to_string(calls))
+
+    texts = run_ocr_batch(_save_inputs(tmp_path))
+
+    assert texts == ["<>", f"<{DIGITAL_TESSERACT_CONFIG}>", "<>"]
+    assert sorted(config for _, config in calls) == sorted(["", DIGITAL_TESSERACT_CONFIG])
+
+
+def test_batch_falls_back_per_image_on_page_mismatch(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        ocr_service.pytesseract, "image_to_string", _fake_image_to_string(calls, drop_pages=True)
+    )
+
+    texts = run_ocr_batch(_save_inputs(tmp_path))
+
+    assert texts == ["<>", f"<{DIGITAL_TESSERACT_CONFIG}>", "<>"]
+    assert sum(1 for image, _ in calls if not str(image).endswith(".txt")) == 3
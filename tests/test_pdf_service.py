@@ -0,0 +1,32 @@
+import io
+
+from PIL import Image
+
+from services.pdf_service import build_ocr_pdf
+
+
+def _jpeg_item(name: str) -> dict:
+    buf = io.BytesIO()
+    Image.new("RGB", (300, 200), "red").save(buf, format="JPEG")
+    return {"file_name": name, "ocr_text": "Oil on canvas", "image_bytes": buf.getvalue()}
+
+
+def test_logo_image_is_decoded_once_for_all_pages(monkeypatch):
+    logo = Image.new("RGBA", (400, 400), (0, 0, 255, 128))
+    logo.load()
+    items = [_jpeg_item(f"{i:02}.jpg") for i in range(20)]
+
+    calls = []
+    original_tobytes = Image.Image.tobytes
+
+    def counting_tobytes(self, *args, **kwargs):
+        if self is logo:
+            calls.append(1)
+        return original_tobytes(self, *args, **kwargs)
+
+    monkeypatch.setattr(Image.Image, "tobytes", counting_tobytes)
+
+    pdf_bytes = build_ocr_pdf(items, logo_image=logo)
+
+    assert pdf_bytes.startswith(b"%PDF")
+    assert len(calls) < len(items)  # hash + encoding once, not once per page
@@ -1,16 +1,21 @@
 from PIL import Image
-import io
 
 
 def read_uploaded_file(uploaded_file) -> bytes:
     """
     Lee el archivo subido por Streamlit y devuelve su contenido en bytes.
+    Usa getvalue() cuando existe (UploadedFile es un BytesIO): devuelve el
+    buffer ya cargado sin depender de la posición del puntero de lectura.
     """
+    if hasattr(uploaded_file, "getvalue"):
+        return uploaded_file.getvalue()
     return uploaded_file.read()
 
 
-def bytes_to_pil_image(image_bytes: bytes) -> Image.Image:
+def uploaded_file_to_pil_image(uploaded_file) -> Image.Image:
     """
-    Convierte bytes de imagen a un objeto PIL.Image para mostrar en la UI.
+    Abre con PIL el archivo subido por Streamlit directamente (ya es un
+    objeto tipo fichero), sin envolver sus bytes en otro BytesIO.
     """
-    return Image.open(io.BytesIO(image_bytes))
+    uploaded_file.seek(0)
+    return Image.open(uploaded_file)